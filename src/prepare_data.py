@@ -1,7 +1,12 @@
 import os
+import re
 import glob
+import json
+import fnmatch
 import tempfile
+import functools
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 import logging
 import argparse
@@ -9,11 +14,16 @@ import argparse
 import numpy as np
 import numpy.testing as npt
 
+import cftime
+
 import dask
-from dask.distributed import Client
+import dask.bag as db
+from dask.distributed import Client, LocalCluster
 
 import xarray as xr
 
+import zarr
+
 from src import utils
 
 
@@ -24,6 +34,189 @@ PROJECT_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = PROJECT_DIR / "data/raw"
 
 
+def _cluster_workers():
+    """
+    The number of dask workers main spins up. Also used to size chunking so
+    that the work divides evenly across the cluster
+    """
+    return int(os.environ.get("CAFE_PREPARE_WORKERS", max(2, os.cpu_count() // 2)))
+
+
+# Cached directory listings
+# ===============================================
+
+
+@functools.lru_cache(maxsize=None)
+def _list_dcpp_files(model, variant_id, grid, realm, variable, version):
+    """
+    List all dcppA-hindcast files for a given model/realm/variable with a single
+    glob, returning a dictionary keyed by (year, member). Globbing per (year,
+    member) is prohibitively slow on networked filesystems so do it once here
+    and index the result
+    """
+    version_pattern = "v????????" if version == "latest" else version
+    paths = glob.glob(
+        f"{DATA_DIR}/{model}/s*-r*{variant_id}/{realm}/{variable}/{grid}/"
+        f"{version_pattern}/{variable}_{realm}_{model}_dcppA-hindcast_"
+        f"s*-r*{variant_id}_{grid}_*.nc"
+    )
+    member_re = re.compile(rf"/s(\d+)-r(\d+){re.escape(variant_id)}/")
+
+    versions = {}
+    for path in paths:
+        y, m = map(int, member_re.search(path).groups())
+        version_dir = os.path.basename(os.path.dirname(path))
+        versions.setdefault((y, m), {}).setdefault(version_dir, []).append(path)
+
+    if version == "latest":
+        return {key: sorted(v[max(v)]) for key, v in versions.items()}
+    else:
+        return {
+            key: sorted(f for files in v.values() for f in files)
+            for key, v in versions.items()
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def _list_cmip_member_files(dataset, variant_id, realm, grid, member):
+    """
+    Index all CMIP6 files available for a single member with one directory
+    walk, returning a dictionary keyed by (variable, version). The member
+    directory holds every variable, so walking it once amortizes the IO
+    across variables
+    """
+    index = {}
+    member_dir = f"{DATA_DIR}/{dataset}/r{member}{variant_id}/{realm}"
+    if not os.path.isdir(member_dir):
+        return index
+    for variable_dir in _fast_list(member_dir):
+        grid_dir = f"{variable_dir}/{grid}"
+        if not os.path.isdir(grid_dir):
+            continue
+        for version_dir in _fast_list(grid_dir, prefix="v"):
+            index[
+                (os.path.basename(variable_dir), os.path.basename(version_dir))
+            ] = _fast_list(version_dir, suffix=".nc")
+    return index
+
+
+def _cmip_member_files(dataset, variant_id, realm, grid, member, variable, version):
+    """
+    Return the files for a single member/variable from the member index,
+    resolving 'latest' or glob-style version strings against the versions
+    actually present
+    """
+    index = _list_cmip_member_files(dataset, variant_id, realm, grid, member)
+    versions = sorted(
+        ver
+        for (v, ver) in index
+        if v == variable
+        and (version == "latest" or fnmatch.fnmatch(ver, version))
+    )
+    if version == "latest":
+        versions = versions[-1:]
+    return sorted(f for ver in versions for f in index[(variable, ver)])
+
+
+def _fast_list(dirpath, prefix="", suffix=""):
+    """
+    List entries in a directory matching a name prefix/suffix using a single
+    scandir call. glob stats every entry, which is slow on networked
+    filesystems
+    """
+    with os.scandir(dirpath) as it:
+        return sorted(
+            e.path
+            for e in it
+            if e.name.startswith(prefix) and e.name.endswith(suffix)
+        )
+
+
+def _prefetch_zarr_coords(files, max_workers=8):
+    """
+    Warm the dimension coordinate arrays of a set of zarr zip stores
+    concurrently. xarray reads coordinate arrays serially at open time, so
+    overlapping those reads across stores hides the per-store IO latency
+    """
+
+    def _prefetch(file):
+        store = zarr.ZipStore(file, mode="r")
+        try:
+            metadata = json.loads(store[".zmetadata"])["metadata"]
+            for key, attrs in metadata.items():
+                name = key[: -len("/.zattrs")]
+                if key.endswith("/.zattrs") and attrs.get(
+                    "_ARRAY_DIMENSIONS"
+                ) == [name]:
+                    for chunk in [k for k in store if k.startswith(f"{name}/")]:
+                        store[chunk]
+        finally:
+            store.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_prefetch, files))
+
+
+def _reconcile_area_coords(ds, area):
+    """
+    Replace coords on an area dataset that differ from ds only by float
+    precision, checking in a single pass per coord that they agree to within
+    tolerance
+    """
+    replace = {}
+    for c in area.coords:
+        if c in ds.coords:
+            a_vals = np.asarray(ds[c].values)
+            b_vals = np.asarray(area[c].values)
+            if a_vals is b_vals or np.array_equal(a_vals, b_vals):
+                continue
+            npt.assert_allclose(a_vals, b_vals, rtol=1e-06)
+            replace[c] = ds[c]
+    return area.assign_coords(replace) if replace else area
+
+
+@functools.lru_cache(maxsize=32)
+def _load_area(file):
+    """
+    Open a static cell-area file, pulling it fully into memory and caching
+    per path so repeated preparations of the same model don't re-open it
+    """
+    return xr.open_dataset(file, chunks={}).load()
+
+
+def _parallel_open(files):
+    """
+    Open multiple files concurrently, returning a list of lazily-loaded
+    datasets. Serial opens on the client are a long IO stall for deep CMIP
+    archives with many time-sliced files per variable
+    """
+    return dask.compute(
+        *[dask.delayed(xr.open_dataset)(f, chunks={}, use_cftime=True) for f in files]
+    )
+
+
+def _bag_open_concat(files, opener, preprocess, concat_dim):
+    """
+    Open and preprocess a list of files on the workers using a dask.bag
+    tree-reduce, concatenating the results along concat_dim. This keeps the
+    per-file open/preprocess work off the client, which otherwise dominates
+    for large numbers of files
+    """
+    if preprocess is None:
+        preprocess = lambda ds: ds
+    return (
+        db.from_sequence(files, npartitions=min(len(files), 64))
+        .map(lambda f: preprocess(opener(f)))
+        .fold(
+            lambda a, b: xr.concat(
+                [a, b], dim=concat_dim, coords="minimal", compat="override"
+            ),
+            split_every=4,
+        )
+        .compute()
+    )
+
+
 # Dataset-specific opening code
 # ===============================================
 
@@ -41,6 +234,7 @@ class _open:
             file,
             engine="zarr",
             chunks={},
+            consolidated=True,
             use_cftime=True,
         )[variables]
         if preprocess is not None:
@@ -66,26 +260,33 @@ class _open:
     @staticmethod
     def EN422(variables, _, preprocess):
         """Open EN.4.2.2 variables"""
-        files = sorted(glob.glob(f"{DATA_DIR}/EN.4.2.2/*.nc"))
-        ds = xr.open_mfdataset(
-            files,
-            preprocess=preprocess,
-            parallel=True,
-            use_cftime=True,
-        )[variables]
-        return ds
+        files = _fast_list(f"{DATA_DIR}/EN.4.2.2", suffix=".nc")
+        # All files share the same encoding, so skip CF decoding per file and
+        # decode once after the concatenate
+        opener = lambda f: xr.open_dataset(f, chunks={}, decode_cf=False)
+        ds = _bag_open_concat(files, opener, None, concat_dim="time")
+        ds = xr.decode_cf(ds, use_cftime=True)[variables]
+        if preprocess is not None:
+            return preprocess(ds)
+        else:
+            return ds
 
     @staticmethod
     def GPCP(variables, _, preprocess):
         """Open GPCP v2.3 variables"""
-        files = sorted(glob.glob(f"{DATA_DIR}/GPCP/????/*.nc"))
-        ds = xr.open_mfdataset(
-            files,
-            preprocess=preprocess,
-            parallel=True,
-            use_cftime=True,
-        )[variables]
-        return ds
+        year_dirs = [
+            d for d in _fast_list(f"{DATA_DIR}/GPCP") if os.path.basename(d).isdigit()
+        ]
+        files = [f for d in year_dirs for f in _fast_list(d, suffix=".nc")]
+        # All files share the same encoding, so skip CF decoding per file and
+        # decode once after the concatenate
+        opener = lambda f: xr.open_dataset(f, chunks={}, decode_cf=False)
+        ds = _bag_open_concat(files, opener, None, concat_dim="time")
+        ds = xr.decode_cf(ds, use_cftime=True)[variables]
+        if preprocess is not None:
+            return preprocess(ds)
+        else:
+            return ds
 
     @staticmethod
     def AGCD(variables, _, preprocess):
@@ -96,18 +297,29 @@ class _open:
         for variable in variables:
             hist_file = f"{DATA_DIR}/AGCD/HISTORICAL/climate/{variable}.nc"
             recent_file = f"{DATA_DIR}/AGCD/climate/{variable}.nc"
-            ds_hist = xr.open_dataset(hist_file, use_cftime=True, chunks=chunks)[
-                [variable]
-            ]
-            ds_recent = xr.open_dataset(recent_file, use_cftime=True, chunks=chunks)[
-                [variable]
-            ]
-            ds_hist = ds_hist.sel(time=slice(None, ds_recent.isel(time=0).time.values))
-            ds_recent = ds_recent.sel(
-                time=slice(ds_recent.isel(time=1).time.values, max_time)
+
+            # Historical data are kept up to the first time in the recent data
+            recent_times = (
+                xr.open_dataset(recent_file, use_cftime=True).time[:2].values
             )
-            result.append(xr.concat((ds_hist, ds_recent), dim="time"))
-        ds = xr.merge(result).chunk(chunks)
+
+            def _trim(ds):
+                if "HISTORICAL" in ds.encoding["source"]:
+                    return ds.sel(time=slice(None, recent_times[0]))
+                else:
+                    return ds.sel(time=slice(recent_times[1], max_time))
+
+            result.append(
+                xr.open_mfdataset(
+                    [hist_file, recent_file],
+                    chunks=chunks,
+                    combine="nested",
+                    concat_dim="time",
+                    preprocess=_trim,
+                    use_cftime=True,
+                )[[variable]]
+            )
+        ds = xr.merge(result)
         if preprocess is not None:
             return preprocess(ds)
         else:
@@ -118,17 +330,21 @@ class _open:
         """Open CAFE-f6 variables from specified realm applying preprocess prior to
         concanenating forecasts
         """
-        files = sorted(
-            glob.glob(f"{DATA_DIR}/CAFEf6/c5-d60-pX-f6-????1101/{realm}.zarr.zip")
-        )
-        return xr.open_mfdataset(
-            files,
-            compat="override",
-            preprocess=preprocess,
-            engine="zarr",
-            coords="minimal",
-            parallel=True,
+        # Match only the November-start runs (c5-d60-pX-f6-????1101); the
+        # archive also holds May starts and rerun/test directories
+        prefix = "c5-d60-pX-f6-"
+        files = [
+            f"{d}/{realm}.zarr.zip"
+            for d in _fast_list(f"{DATA_DIR}/CAFEf6", prefix=prefix, suffix="1101")
+            if len(os.path.basename(d)) == len(prefix) + 8
+            and os.path.basename(d)[len(prefix) :].isdigit()
+            and os.path.exists(f"{d}/{realm}.zarr.zip")
+        ]
+        _prefetch_zarr_coords(files)
+        opener = lambda f: xr.open_dataset(
+            f, engine="zarr", chunks={}, consolidated=True
         )[variables]
+        return _bag_open_concat(files, opener, preprocess, concat_dim="init")
 
     @staticmethod
     def CAFEf5(variables, realm, preprocess):
@@ -136,7 +352,9 @@ class _open:
         10 members of CAFE-f6 for 2020 forecast
         """
         file = DATA_DIR / f"CAFEf5/NOV/{realm}.zarr.zip"
-        ds = xr.open_dataset(file, engine="zarr", chunks={})[variables]
+        ds = xr.open_dataset(file, engine="zarr", chunks={}, consolidated=True)[
+            variables
+        ]
         if preprocess is not None:
             return preprocess(ds)
         else:
@@ -146,7 +364,9 @@ class _open:
     def CAFE60v1(variables, realm, preprocess):
         """Open CAFE60v1 variables from specified realm"""
         file = DATA_DIR / f"CAFE60v1/{realm}.zarr.zip"
-        ds = xr.open_dataset(file, engine="zarr", chunks={})[variables]
+        ds = xr.open_dataset(file, engine="zarr", chunks={}, consolidated=True)[
+            variables
+        ]
         if preprocess is not None:
             return preprocess(ds)
         else:
@@ -156,19 +376,25 @@ class _open:
     def CAFE_hist(variables, realm, preprocess):
         """Open CAFE historical run variables from specified realm"""
         hist_file = DATA_DIR / f"CAFE_hist/{realm}.zarr.zip"
-        hist = xr.open_dataset(hist_file, engine="zarr", chunks={})[variables]
+        hist = xr.open_dataset(
+            hist_file, engine="zarr", chunks={}, consolidated=True
+        )[variables]
 
         ctrl_file = DATA_DIR / f"CAFE_ctrl/{realm}.zarr.zip"
-        ctrl = xr.open_dataset(ctrl_file, engine="zarr", chunks={})[variables]
+        ctrl = xr.open_dataset(
+            ctrl_file, engine="zarr", chunks={}, consolidated=True
+        )[variables]
 
         hist = utils.truncate_latitudes(hist)
-        ctrl = utils.truncate_latitudes(ctrl)
-
-        drift = (
-            ctrl.mean("ensemble")
-            .groupby("time.month")
-            .map(lambda x: x - x.mean(["time"]))
+        # ctrl is on the same grid as hist, so reuse the truncated latitudes
+        # rather than rounding them a second time
+        ctrl = ctrl.assign_coords(
+            {dim: hist[dim] for dim in ctrl.dims if "lat" in dim}
         )
+
+        ctrl_mean = ctrl.mean("ensemble")
+        clim = ctrl_mean.groupby("time.month").mean("time")
+        drift = (ctrl_mean.groupby("time.month") - clim).drop("month")
         ds = hist - drift
         if preprocess is not None:
             return preprocess(ds)
@@ -182,53 +408,56 @@ class _open:
         """Open CMIP6 dcppA-hindcast variables from specified monthly realm"""
 
         def _dcpp_file(y, m, v):
-            path = f"{DATA_DIR}/{model}/s{y}-r{m}{variant_id}/{realm}/{v}/{grid}"
-            if version == "latest":
-                versions = sorted(glob.glob(f"{path}/v????????"))
-                if len(versions) == 0:
-                    raise ValueError(f"No versions found for {path}")
-                else:
-                    path = versions[-1]
-            else:
-                path = f"{path}/{version}"
-
-            file_pattern = (
-                f"{v}_{realm}_{model}_dcppA-hindcast_s{y}-r{m}{variant_id}_{grid}_*.nc"
+            files = _list_dcpp_files(model, variant_id, grid, realm, v, version).get(
+                (y, m)
             )
-            files = sorted(glob.glob(f"{path}/{file_pattern}"))
-            if len(files) == 0:
-                raise ValueError(f"No files found for {path}/{file_pattern}")
+            if not files:
+                raise ValueError(
+                    f"No files found for {model}/s{y}-r{m}{variant_id}/{realm}/{v}/"
+                    f"{grid}/{version}"
+                )
             else:
                 return files
 
-        @dask.delayed
-        def _open_dcpp_delayed(y, m, v):
+        def _open_dcpp(y, m, v):
+            """Load a single (year, member) of a variable into memory"""
             files = _dcpp_file(y, m, v)
             return xr.concat(
-                [xr.open_dataset(f, chunks={}, use_cftime=True) for f in files],
+                [xr.open_dataset(f, use_cftime=True) for f in files],
                 dim="time",
-            )[v]
+            )[v].values
 
-        def _open_dcpp(y, m, v, d0):
-            var_data = _open_dcpp_delayed(y, m, v).data
-            return dask.array.from_delayed(var_data, d0.shape, d0.dtype)
+        def _open_dcpp_block(block, v, block_info=None):
+            """Load the (years, member) corresponding to a dask block"""
+            (y_lo, y_hi), (m_lo, _) = block_info[None]["array-location"][:2]
+            return np.stack(
+                [_open_dcpp(years[y], members[m_lo], v) for y in range(y_lo, y_hi)]
+            )[:, np.newaxis, ...]
 
         ds = []
         for v in variables:
             f0 = _dcpp_file(years[0], members[0], v)
-            ds0 = xr.concat(
-                [xr.open_dataset(f, chunks={}, use_cftime=True) for f in f0], dim="time"
-            )
+            ds0 = xr.concat(_parallel_open(f0), dim="time")
             ds0 = utils.convert_time_to_lead(ds0, time_freq="months")
             ds0 = utils.round_to_start_of_month(ds0, dim="init")
             d0 = ds0[v]
 
-            delayed = []
-            for y in years:
-                delayed.append(
-                    dask.array.stack([_open_dcpp(y, m, v, d0) for m in members], axis=0)
-                )
-            delayed = dask.array.stack(delayed, axis=0)
+            # Build the ensemble as a single abstract graph layer, rather than
+            # one client-materialized delayed task per (year, member), which
+            # swamps the scheduler for large ensembles. Batch several inits
+            # into each block so the scheduler tracks of order n_workers tasks
+            # along the init dimension rather than one per year
+            init_chunk = max(1, len(years) // _cluster_workers())
+            delayed = dask.array.map_blocks(
+                _open_dcpp_block,
+                dask.array.empty(
+                    shape=(len(years), len(members), *d0.shape),
+                    chunks=(init_chunk, 1, *d0.shape),
+                    dtype=d0.dtype,
+                ),
+                v=v,
+                meta=np.array((), dtype=d0.dtype),
+            )
 
             init = xr.cftime_range(
                 ds0.init.dt.strftime(
@@ -238,12 +467,17 @@ class _open:
                 freq="12MS",
                 calendar="julian",
             )
-            time = [
-                xr.cftime_range(
-                    i, periods=ds0.sizes["lead"], freq="MS", calendar="julian"
-                )
-                for i in init
-            ]
+            # Each hindcast verifies at consecutive month starts, so build all
+            # of the time coordinates from a single grid of month ordinals
+            # rather than one cftime_range per init
+            months = (
+                (init[0].year * 12 + init[0].month - 1)
+                + 12 * np.arange(len(years))[:, np.newaxis]
+                + np.arange(ds0.sizes["lead"])[np.newaxis, :]
+            )
+            time = np.frompyfunc(
+                lambda m: cftime.DatetimeJulian(m // 12, m % 12 + 1, 1), 1, 1
+            )(months)
             ds.append(
                 xr.DataArray(
                     delayed,
@@ -257,7 +491,7 @@ class _open:
                     attrs=d0.attrs,
                 ).to_dataset(name=v)
             )
-        return xr.merge(ds).compute()
+        return xr.merge(ds)
 
     @staticmethod
     def CanESM5(variables, realm, preprocess):
@@ -284,7 +518,7 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
         ds = ds.assign_coords(area)
 
         if preprocess is not None:
@@ -317,16 +551,10 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
 
         # Lat and lon values are not exactly the same to numerical precision for ds and area
-        for c in area.coords:
-            if c in ds.coords:
-                if np.array_equiv(ds[c].values, area[c].values):
-                    pass
-                else:
-                    npt.assert_allclose(ds[c].values, area[c].values, rtol=1e-06)
-                    area = area.assign_coords({c: ds[c]})
+        area = _reconcile_area_coords(ds, area)
 
         ds = ds.assign_coords(area)
 
@@ -360,7 +588,7 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
         ds = ds.assign_coords(area)
 
         if preprocess is not None:
@@ -412,21 +640,14 @@ class _open:
             else:
                 raise ValueError("I'm not sure I can open this experiment type")
 
-            path = f"{DATA_DIR}/{dataset}/r{m}{variant_id}/{realm}/{v}/{grid}"
-            if version == "latest":
-                versions = sorted(glob.glob(f"{path}/v????????"))
-                if len(versions) == 0:
-                    raise ValueError(f"No versions found for {path}")
-                else:
-                    path = versions[-1]
-            else:
-                path = f"{path}/{version}"
-            file_pattern = (
-                f"{v}_{realm}_{model}_{experiment}_r{m}{variant_id}_{grid}_*.nc"
+            files = _cmip_member_files(
+                dataset, variant_id, realm, grid, m, v, version
             )
-            files = sorted(glob.glob(f"{path}/{file_pattern}"))
-            if len(files) == 0:
-                raise ValueError(f"No files found for {path}/{file_pattern}")
+            if not files:
+                raise ValueError(
+                    f"No files found for {dataset}/r{m}{variant_id}/{realm}/{v}/"
+                    f"{grid}/{version}"
+                )
             else:
                 return files
 
@@ -445,9 +666,7 @@ class _open:
         ds = []
         for v in variables:
             f0 = _cmip_files(members[0], v)
-            d0 = xr.concat(
-                [xr.open_dataset(f, chunks={}, use_cftime=True) for f in f0], dim="time"
-            )[v]
+            d0 = xr.concat(_parallel_open(f0), dim="time")[v]
 
             delayed = dask.array.stack([_open_cmip(m, v) for m in members], axis=0)
 
@@ -463,7 +682,7 @@ class _open:
                 ).to_dataset(name=v)
             )
 
-        return xr.merge(ds).compute()
+        return xr.merge(ds)
 
     @staticmethod
     def CanESM5_hist(variables, realm, preprocess):
@@ -491,7 +710,7 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
         ds = ds.assign_coords(area)
 
         if preprocess is not None:
@@ -518,7 +737,7 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
         ds = ds.assign_coords(area)
 
         if preprocess is not None:
@@ -558,16 +777,10 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
 
         # Lat and lon values are not exactly the same to numerical precision for ds and area
-        for c in area.coords:
-            if c in ds.coords:
-                if np.array_equiv(ds[c].values, area[c].values):
-                    pass
-                else:
-                    npt.assert_allclose(ds[c].values, area[c].values, rtol=1e-06)
-                    area = area.assign_coords({c: ds[c]})
+        area = _reconcile_area_coords(ds, area)
 
         ds = ds.assign_coords(area)
 
@@ -596,16 +809,10 @@ class _open:
             )
         else:
             raise ValueError(f"I don't know where to find the area for realm: {realm}")
-        area = xr.open_dataset(file, chunks={})
+        area = _load_area(file)
 
         # Lat and lon values are not exactly the same to numerical precision for ds and area
-        for c in area.coords:
-            if c in ds.coords:
-                if np.array_equiv(ds[c].values, area[c].values):
-                    pass
-                else:
-                    npt.assert_allclose(ds[c].values, area[c].values, rtol=1e-06)
-                    area = area.assign_coords({c: ds[c]})
+        area = _reconcile_area_coords(ds, area)
 
         ds = ds.assign_coords(area)
 
@@ -623,8 +830,8 @@ def maybe_generate_CAFE_grid_files():
     """Generate files containing CAFE grids"""
     path = DATA_DIR / "CAFE_hist/"
 
-    atmos_file = DATA_DIR / "gridinfo/CAFE_atmos_grid.nc"
-    if not os.path.exists(atmos_file):
+    atmos_file = DATA_DIR / "gridinfo/CAFE_atmos_grid.zarr"
+    if not (os.path.exists(atmos_file) or os.path.exists(atmos_file.with_suffix(".nc"))):
         atmos = (
             xr.open_zarr(f"{path}/atmos_hybrid_month.zarr.zip")
             .isel(time=0, ensemble=0)
@@ -644,10 +851,10 @@ def maybe_generate_CAFE_grid_files():
         )
         atmos_grid.attrs = {}
         atmos_grid.attrs = {}
-        atmos_grid.to_netcdf(atmos_file, mode="w")
+        atmos_grid.to_zarr(atmos_file, mode="w", consolidated=True)
 
-    ocean_file = DATA_DIR / "gridinfo/CAFE_ocean_grid.nc"
-    if not os.path.exists(ocean_file):
+    ocean_file = DATA_DIR / "gridinfo/CAFE_ocean_grid.zarr"
+    if not (os.path.exists(ocean_file) or os.path.exists(ocean_file.with_suffix(".nc"))):
         ocean = (
             xr.open_zarr(f"{path}/ocean_month.zarr.zip")
             .isel(time=0, ensemble=0)
@@ -673,7 +880,7 @@ def maybe_generate_CAFE_grid_files():
         )
         ocean_grid = xr.merge([ocean_ut_grid, ocean_tu_grid])
         ocean_grid.attrs = {}
-        ocean_grid.to_netcdf(ocean_file, mode="w")
+        ocean_grid.to_zarr(ocean_file, mode="w", consolidated=True)
 
 
 # def maybe_generate_HadISST_grid_file():
@@ -693,6 +900,23 @@ def maybe_generate_CAFE_grid_files():
 # ===============================================
 
 
+def _maybe_unify_chunks(ds):
+    """
+    Unify chunks only when the chunking actually differs between variables.
+    unify_chunks walks (and may rechunk) every variable, which is wasted work
+    in the common case where the inputs already align
+    """
+    chunks_by_dim = {}
+    for var in ds.variables:
+        variable = ds[var].variable
+        if variable.chunks is None:
+            continue
+        for dim, chunks in zip(variable.dims, variable.chunks):
+            if chunks_by_dim.setdefault(dim, chunks) != chunks:
+                return ds.unify_chunks()
+    return ds
+
+
 def prepare_dataset(config, save_dir, save=True):
     """
     Prepare a dataset according to a provided config file
@@ -727,6 +951,7 @@ def prepare_dataset(config, save_dir, save=True):
 
     if "prepare" in cfg:
         prepared = []
+        writes = []
 
         for identifier, params in cfg["prepare"].items():
             input_variables = params["uses"]
@@ -743,16 +968,27 @@ def prepare_dataset(config, save_dir, save=True):
             ds = []
             for realm, var in input_variables.items():
                 if realm == "prepared":
-                    ds.append(
-                        xr.merge(
-                            xr.open_zarr(
-                                f"{save_dir}/{cfg['name']}.{v}.zarr",
-                                decode_timedelta=False,
-                                use_cftime=True,
+                    # Earlier outputs must be on disk before they can be
+                    # re-opened
+                    if writes:
+                        dask.compute(*writes)
+                        writes = []
+                    # Open the previously-prepared stores concurrently; the
+                    # opens are dominated by metadata/coord reads, which a
+                    # generator into xr.merge would serialise
+                    with ThreadPoolExecutor(max_workers=8) as executor:
+                        opened = list(
+                            executor.map(
+                                lambda v: xr.open_zarr(
+                                    f"{save_dir}/{cfg['name']}.{v}.zarr",
+                                    decode_timedelta=False,
+                                    use_cftime=True,
+                                    consolidated=True,
+                                ),
+                                var,
                             )
-                            for v in var
                         )
-                    )
+                    ds.append(xr.merge(opened))
                 else:
                     if hasattr(_open, cfg["name"]):
                         ds.append(getattr(_open, cfg["name"])(var, realm, preprocess))
@@ -767,10 +1003,24 @@ def prepare_dataset(config, save_dir, save=True):
 
             prepared.append(ds)
             if save:
-                ds = ds.unify_chunks()
-                for var in ds.variables:
-                    ds[var].encoding = {}
-                ds.to_zarr(f"{save_dir}/{cfg['name']}.{identifier}.zarr", mode="w")
+                ds = _maybe_unify_chunks(ds)
+                # Drop the encodings inherited from the source files in one
+                # pass; to_zarr otherwise tries to honour them
+                if hasattr(ds, "drop_encoding"):
+                    ds = ds.drop_encoding()
+                else:
+                    for var in ds.variables:
+                        ds[var].encoding = {}
+                writes.append(
+                    ds.to_zarr(
+                        f"{save_dir}/{cfg['name']}.{identifier}.zarr",
+                        mode="w",
+                        compute=False,
+                    )
+                )
+
+        if writes:
+            dask.compute(*writes)
 
         logger.info(f"Succeeded processing all variables")
         return prepared
@@ -796,7 +1046,12 @@ def main(config, config_dir, save_dir):
 
     logger.info("Spinning up a dask cluster")
     local_directory = tempfile.TemporaryDirectory()
-    with Client(processes=False, local_directory=local_directory.name) as client:
+    with LocalCluster(
+        n_workers=_cluster_workers(),
+        threads_per_worker=2,
+        memory_limit="auto",
+        local_directory=local_directory.name,
+    ) as cluster, Client(cluster) as client:
         logger.info("Generating grid files")
         maybe_generate_CAFE_grid_files()
 
